@@ -1,12 +1,30 @@
 #!/usr/bin/env python3
 
+from collections.abc import Iterator
 import logging
+import os
 from lxml import etree
 from pathlib import Path
+from typing import ClassVar
 
 
 logger = logging.getLogger(__name__)
 
+# Compiled XPath expressions for top level manifest elements, keyed by tag name.
+# The tags used by this module are compiled up front, anything else on first use.
+_XPATH_CACHE: dict[str, etree.XPath] = {
+    tag: etree.XPath(f'/*/{tag}') for tag in (
+        'remote', 'project', 'remove-project', 'post-sync', 'default',
+        'git_flow', 'submanifest', 'annotation', 'include', 'linkfile')
+}
+
+def _xp(tag: str) -> etree.XPath:
+    """Get the compiled XPath matching top level elements with the given tag."""
+    xpath = _XPATH_CACHE.get(tag)
+    if xpath is None:
+        xpath = _XPATH_CACHE[tag] = etree.XPath(f'/*/{tag}')
+    return xpath
+
 class ManifestElementInterface:
     """Interface class for using manifest elements as objects with
     their variables as actual attributes.
@@ -21,21 +39,30 @@ class ManifestElementInterface:
     Attributes:
         self._element (_Element): The original xml element passed into this interface.
         self._manifest (ScManifest): The ScManifest object this element belongs to.
+        self._defaults (dict[str, str]): The manifest's <default> attributes, used for
+            attributes not set on the element.
     """
+    __slots__ = ('_element', '_manifest', '_defaults')
+    _element: etree._Element
+    _manifest: "ScManifest"
+    _defaults: dict[str, str]
+
     def __init__(self, element: etree._Element, manifest: "ScManifest"):
         # Use super() due to overriding __setattr__
         super().__setattr__('_element', element)
         super().__setattr__('_manifest', manifest)
+        super().__setattr__('_defaults', manifest._default_attrs)
 
     def __getattr__(self, name: str) -> str | None:
-        value = self._element.attrib.get(name)
+        value = self._element.get(name)
         if value is None:
-            return self._manifest.get_default_value(name)
+            return self._defaults.get(name)
         return value
     
     def __setattr__(self, name: str, value: str):
         """Setting attr on the interface sets the attribute on the element."""
-        self._element.attrib[name] = value
+        self._element.set(name, value)
+        self._manifest._invalidate_cache(self._element)
     
     def __delattr__(self, name: str):
         """Deleting attr on the interface deletes the attribute on the element."""
@@ -45,17 +72,25 @@ class ManifestElementInterface:
             raise AttributeError(
                 f"Attribute '{name}' not set on element (may be inherited from <default>)"
             )
+        self._manifest._invalidate_cache(self._element)
 
     def remove(self):
         parent = self._element.getparent()
         parent.remove(self._element)
+        self._manifest._invalidate_cache()
 
     @property
     def children(self) -> list["ManifestElementInterface"]:
-        return [ManifestElementInterface(child, self._manifest) for child in self._element]
+        return list(self.iter_children())
+
+    def iter_children(self) -> Iterator["ManifestElementInterface"]:
+        """Lazily wrap the children of the current node, one at a time."""
+        for child in self._element.iterchildren():
+            yield ManifestElementInterface(child, self._manifest)
     
     def add_child(self, name: str, attributes: dict[str, str]) -> "ManifestElementInterface":
         child = etree.SubElement(self._element, name, attrib=attributes)
+        self._manifest._invalidate_cache()
         return ManifestElementInterface(child, self._manifest)
     
     def search_children(self, name: str) -> list["ManifestElementInterface"] | None:
@@ -68,15 +103,22 @@ class ManifestElementInterface:
             list[ManifestElementInterface] | None: A list of all the children that match
                 the name. None if no children with the given name are found.
         """
-        return [child for child in self.children if child._element.tag == name]
+        return [ManifestElementInterface(child, self._manifest)
+                for child in self._element.iterchildren(tag=name)]
 
 class ProjectElementInterface(ManifestElementInterface):
     """Extends the ManifestElementInterface to add functionality for getting attributes from
     annotation elements. Specifically designed to handle <project.../> elements from the manifest.
     """
+    __slots__ = ()
+
+    # First annotation naming either the requested git flow branch or a git flow suffix.
+    _ALTERNATIVE_BRANCH_XPATH: ClassVar[etree.XPath] = etree.XPath(
+        "annotation[@name=$branch or @name='GIT_FLOW_SUFFIX'][1]")
+
     @property
     def path(self) -> str:
-        return self._element.attrib.get('path') or self._element.attrib.get('name')
+        return self._element.get('path') or self._element.get('name')
     
     @property
     def lock_status(self) -> str | None:
@@ -85,13 +127,10 @@ class ProjectElementInterface(ManifestElementInterface):
         Returns:
             str: The value of the annotation element with name set to GIT_LOCK_STATUS.
         """
-        annotations = self.search_children('annotation')
-        
-        if annotations:
-            matched_annotations = [a for a in annotations if a.name == 'GIT_LOCK_STATUS']
-            if matched_annotations:
-                return matched_annotations[0].value
-        
+        for annotation in self._element.iterchildren(tag='annotation'):
+            if annotation.get('name') == 'GIT_LOCK_STATUS':
+                return annotation.get('value')
+
         return None
     
     @property
@@ -113,20 +152,15 @@ class ProjectElementInterface(ManifestElementInterface):
             str: The value of the annotation element with name set to 
                 GIT_FLOW_BRANCH_<argument branch> or GIT_FLOW_SUFFIX.
         """
-        annotations = self.search_children('annotation')
+        annotations = self._ALTERNATIVE_BRANCH_XPATH(
+            self._element, branch=f"GIT_FLOW_BRANCH_{branch.upper()}")
         if not annotations:
             return None
-        
-        branch_annotation = f"GIT_FLOW_BRANCH_{branch.upper()}"
-        suffix_annotation = "GIT_FLOW_SUFFIX"
-
-        for annotation in annotations:
-            if annotation.name == branch_annotation:
-                return annotation.value
-            if annotation.name == suffix_annotation:
-                return f"{branch}-{annotation.value}"
-        
-        return None
+
+        annotation = annotations[0]
+        if annotation.get('name') == "GIT_FLOW_SUFFIX":
+            return f"{branch}-{annotation.get('value')}"
+        return annotation.get('value')
 
 class ScManifest:
     """Represents an sc manifest."""
@@ -138,13 +172,10 @@ class ScManifest:
                 'Cannot find manifest path supplied: {manifest_path}'.format(
                     manifest_path=self.manifest_path))
 
-        self.xml_parser = etree.XMLParser(remove_blank_text=True)
+        self.xml_parser = etree.XMLParser(remove_blank_text=True, collect_ids=False)
         tree = etree.parse(self.manifest_path, self.xml_parser)
         self.manifests[self.manifest_path] = tree
-
-        root = tree.getroot()
-        for inc in root.findall('include'):
-            self._parse_include(inc.get('name'), self.manifest_path.parent)
+        self._parse_includes(self.manifest_path)
 
         defaults = self._find_all('default') 
         if len(defaults) > 1:
@@ -153,6 +184,17 @@ class ScManifest:
             self._default = defaults[0]
         else:
             self._default = None
+        self._default_attrs: dict[str, str] = {}
+        self._refresh_default_attrs()
+        self._default_wrapper = (ManifestElementInterface(self._default, self)
+                                 if self._default is not None else None)
+        self._git_flow_wrapper: ManifestElementInterface | None = None
+
+        # Project lookups are cached until an element is modified through an interface.
+        self._projects_cache: list[ProjectElementInterface] | None = None
+        self._by_name: dict[str, etree._Element] | None = None
+        self._by_path: dict[str, etree._Element] | None = None
+        self._project_index()
 
     @classmethod
     def from_repo_root(cls, repo_root: Path | str) -> "ScManifest":
@@ -170,14 +212,14 @@ class ScManifest:
         """    
         manifest_xml = Path(repo_root) / 'manifest.xml'
         if manifest_xml.is_symlink():
-            return cls(repo_root / manifest_xml.readlink())
+            return cls(manifest_xml.parent / manifest_xml.readlink())
         else:
             root = etree.parse(manifest_xml).getroot()
             included = root.findall('include')
             if len(included) != 1:
                 raise ValueError(
                     "Incorrect number of included manifests in " + str(manifest_xml) +
-                    "! Should be one but is " + len(included)
+                    "! Should be one but is " + str(len(included))
                 )
             return cls(manifest_xml.parent / 'manifests' / included[0].attrib['name'])
 
@@ -188,13 +230,11 @@ class ScManifest:
     @property
     def projects(self) -> list[ProjectElementInterface]:
         """Get all project attributes, removing any specified by remove-project attributes
-        """        
-        projects = [ProjectElementInterface(proj, self) for 
-                    proj in self._find_all('project')]
-        
-        projects = self._apply_remove_project_attributes(projects)
-        
-        return projects
+        """
+        if self._projects_cache is None:
+            self._projects_cache = [ProjectElementInterface(proj, self) for
+                                    proj in self._iter_raw_projects()]
+        return list(self._projects_cache)
     
     @property
     def remove_projects(self) -> list[ManifestElementInterface]:
@@ -207,12 +247,15 @@ class ScManifest:
 
     @property
     def default(self) -> ManifestElementInterface | None:
-        return ManifestElementInterface(self._default, self)
+        return self._default_wrapper
 
     @property
     def git_flow(self) -> ManifestElementInterface | None:
-        git_flow = self._find_all('git_flow')
-        return ManifestElementInterface(git_flow[0], self) if len(git_flow) != 0 else None
+        if self._git_flow_wrapper is None:
+            git_flow = self._find_all('git_flow')
+            if len(git_flow) != 0:
+                self._git_flow_wrapper = ManifestElementInterface(git_flow[0], self)
+        return self._git_flow_wrapper
     
     @property
     def submanifests(self) -> list["ScManifest"]:
@@ -220,7 +263,7 @@ class ScManifest:
         return [ScManifest(self.manifest_path / sub.get('path')) for sub in subman_elems]
     
     def get_default_value(self, name: str) -> str | None:
-        return self._default.get(name) if self._default is not None else None
+        return self._default_attrs.get(name)
 
     def get_project_by_name(self, project_name: str) -> ProjectElementInterface:
         """Get a ProjectElementInterface object for the project with the given name.
@@ -235,10 +278,12 @@ class ScManifest:
             ProjectElementInterface: ProjectElementInterface object with name 
                 attribute matching project_name.
         """
-        for project in self.projects:
-            if project.name == project_name:
-                return project
-        raise AttributeError ('No project found with name: {}'.format(project_name))
+        by_name, _ = self._project_index()
+        try:
+            return ProjectElementInterface(by_name[project_name], self)
+        except KeyError:
+            raise AttributeError(
+                'No project found with name: {}'.format(project_name)) from None
 
     def get_project_by_path(self, project_path: str | Path) -> ProjectElementInterface:
         """Get a ProjectElementInterface object for the project with the given path.
@@ -253,10 +298,12 @@ class ScManifest:
             ProjectElementInterface: ProjectElementInterface object with path 
                 attribute matching project_path.
         """
-        for project in self.projects:
-            if project.path == str(project_path):
-                return project
-        raise AttributeError('No project found with path: {}'.format(project_path))
+        _, by_path = self._project_index()
+        try:
+            return ProjectElementInterface(by_path[str(project_path)], self)
+        except KeyError:
+            raise AttributeError(
+                'No project found with path: {}'.format(project_path)) from None
 
     def get_remote_by_name(self, remote_name: str) -> ManifestElementInterface:
         """Get a `ManifestElementInterface` object for the remote with the given name.
@@ -277,48 +324,139 @@ class ScManifest:
         raise AttributeError ('No project found with name: {}'.format(remote_name))
     
     def write(self):
+        """Write every parsed manifest back to the file it was read from."""
         for source_file, tree in self.manifests.items():
-            with open(source_file, 'wb') as file:
-                tree.write(file, pretty_print=True, xml_declaration=True)
+            tree.write(source_file, pretty_print=True, xml_declaration=True, encoding='UTF-8')
+
+    def _invalidate_cache(self, element: etree._Element | None = None):
+        """Drop cached project lookups after the manifest has been modified.
+
+        Args:
+            element (_Element | None): The element whose attributes were modified, if any.
+        """
+        self._projects_cache = None
+        self._by_name = None
+        self._by_path = None
+        self._git_flow_wrapper = None
+        if element is not None and element is self._default:
+            self._refresh_default_attrs()
+
+    def _refresh_default_attrs(self):
+        """Snapshot the <default> attributes used to resolve unset element attributes."""
+        self._default_attrs.clear()
+        if self._default is not None:
+            self._default_attrs.update(self._default.attrib)
+
+    def _project_index(self) -> tuple[dict[str, etree._Element], dict[str, etree._Element]]:
+        """Get the project name and path lookups, building them if the manifest has changed.
+
+        The first project with a given name or path wins, matching a linear search.
+        """
+        if self._by_name is None or self._by_path is None:
+            self._by_name = {}
+            self._by_path = {}
+            for proj in self._iter_raw_projects():
+                name = proj.get('name')
+                self._by_name.setdefault(name, proj)
+                self._by_path.setdefault(proj.get('path') or name, proj)
+        return self._by_name, self._by_path
 
     def _find_all(self, element_name: str) -> list[etree._Element]:
         """Find all top level elements by name in all included manifests."""
         results = []
+        xpath = _xp(element_name)
         for tree in self.manifests.values():
-            elements = tree.getroot().findall(element_name)
-            results.extend(elements)
+            results.extend(xpath(tree))
         return results
                 
-    def _parse_include(self, path: Path | str, include_root: Path | str):
-        full_path = Path(include_root) / path
-        include_manifest: etree._ElementTree = etree.parse(str(full_path), self.xml_parser)
-        self.manifests[full_path] = include_manifest
-
-        for subelement in include_manifest.getroot():
-            if subelement.tag == "include":
-                if subelement.get('name') == None:
-                    raise ValueError(
-                        f"Include element in manifest {full_path} missing name!")
+    def _parse_includes(self, manifest_path: Path):
+        """Parse all manifests included, directly or indirectly, by an already parsed manifest.
 
-                self._parse_include(subelement.get('name'), full_path.parent)
+        Manifests are added to self.manifests depth first in the order they are included.
+        A manifest that is included more than once is only parsed once, under the path
+        it was first included by.
+        """
+        seen = {os.path.realpath(manifest_path)}
+        stack = self._get_include_paths(manifest_path, self.manifests[manifest_path])[::-1]
+        while stack:
+            full_path = stack.pop()
+            real_path = os.path.realpath(full_path)
+            if real_path in seen:
+                continue
+            seen.add(real_path)
+            include_manifest: etree._ElementTree = etree.parse(full_path, self.xml_parser)
+            self.manifests[full_path] = include_manifest
+            stack.extend(self._get_include_paths(full_path, include_manifest)[::-1])
+
+    def _include_path(self, manifest_path: Path, include: etree._Element) -> Path:
+        """Get the path of the manifest an <include> element in a parsed manifest names."""
+        return manifest_path.parent / include.get('name')
+
+    def _get_include_paths(self, manifest_path: Path, tree: etree._ElementTree) -> list[Path]:
+        """Get the paths of the manifests directly included by a parsed manifest."""
+        include_paths = []
+        for include in _xp('include')(tree):
+            if include.get('name') is None:
+                raise ValueError(
+                    f"Include element in manifest {manifest_path} missing name!")
+            include_paths.append(self._include_path(manifest_path, include))
+        return include_paths
 
-    def _apply_remove_project_attributes(
-            self, projects: list[ProjectElementInterface]) -> list[ProjectElementInterface]:
-        """Remove projects specified by <remove-project> attributes.
+    def _iter_raw_projects(self) -> Iterator[etree._Element]:
+        """Yield all project elements, skipping any removed by <remove-project> elements.
 
-        If <remove-project> has both name and path values it must match both otherwise
-        just match the name or path value.
+        A <remove-project> only removes projects that come before it, so a project can be
+        replaced by removing it and declaring it again. If <remove-project> has both name
+        and path values it must match both otherwise just match the name or path value.
         """
-        for rm in self.remove_projects:
-            for project in projects:
-                if rm.name == project.name and rm.path == project.path:
-                    projects.remove(project)
-                    break
-                elif rm.name == project.name and rm.path == None:
-                    projects.remove(project)
-                    break
-                elif rm.name == None and rm.path == project.path:
-                    projects.remove(project)
-                    break
-                
-        return projects
+        # Walk backwards so each project is only checked against the removals after it.
+        remove_by_both = set()
+        remove_by_name = set()
+        remove_by_path = set()
+        kept = set()
+        for element in self._document_order('project', 'remove-project')[::-1]:
+            name = element.get('name')
+            if element.tag == 'remove-project':
+                path = element.get('path')
+                if name is not None and path is not None:
+                    remove_by_both.add((name, path))
+                elif name is not None:
+                    remove_by_name.add(name)
+                elif path is not None:
+                    remove_by_path.add(path)
+                continue
+
+            path = element.get('path') or name
+            if ((name, path) not in remove_by_both
+                    and name not in remove_by_name
+                    and path not in remove_by_path):
+                kept.add(element)
+
+        for proj in self._find_all('project'):
+            if proj in kept:
+                yield proj
+
+    def _document_order(self, *tags: str) -> list[etree._Element]:
+        """Get top level elements with the given tags in document order.
+
+        Included manifests are expanded at the position of their <include> element, each
+        manifest only once, as repo reads them.
+        """
+        elements = []
+        seen = {self.manifest_path}
+        stack = [(self.manifest_path,
+                  self.manifests[self.manifest_path].getroot().iterchildren('include', *tags))]
+        while stack:
+            manifest_path, children = stack[-1]
+            element = next(children, None)
+            if element is None:
+                stack.pop()
+            elif element.tag != 'include':
+                elements.append(element)
+            else:
+                include_path = self._include_path(manifest_path, element)
+                if include_path in self.manifests and include_path not in seen:
+                    seen.add(include_path)
+                    stack.append((include_path, self.manifests[include_path].getroot()
+                                  .iterchildren('include', *tags)))
+        return elements
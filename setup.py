@@ -1,15 +1,38 @@
+import os
+
 from setuptools import find_packages, setup
 
 def read_version():
     with open("VERSION", "r") as f:
         return f.read().strip()
 
+MIN_MYPY_VERSION = (1, 19)
+
+def build_extensions():
+    """Compile the parser with mypyc when SC_MANIFEST_PARSER_USE_MYPYC=1 is set.
+
+    The compiled module is imported in place of sc_manifest_parser.py when it is present,
+    and the pure Python module is used when it is not.
+    """
+    if os.environ.get("SC_MANIFEST_PARSER_USE_MYPYC") != "1":
+        return []
+    # Older mypyc compiles the interfaces' __getattr__/__setattr__ without dispatching to them.
+    from mypy.version import __version__ as mypy_version
+    if tuple(int(part) for part in mypy_version.split("+")[0].split(".")[:2]) < MIN_MYPY_VERSION:
+        raise RuntimeError(
+            f"Building with mypyc needs mypy>={'.'.join(map(str, MIN_MYPY_VERSION))}, "
+            f"found {mypy_version}")
+    from mypyc.build import mypycify
+    return mypycify(
+        ["--ignore-missing-imports", "sc_manifest_parser/sc_manifest_parser.py"])
+
 setup(
     name="sc_manifest_parser",
     version=read_version(),
     description="A library that parses repo manifests",
     packages=find_packages(),
+    ext_modules=build_extensions(),
     install_requires=[
         'lxml'
     ]
-)
\ No newline at end of file
+)
@@ -1,6 +1,8 @@
 #/usr/bin/env python3
 
 from pathlib import Path
+import shutil
+import tempfile
 import unittest
 
 from sc_manifest_parser.sc_manifest_parser import ScManifest, ManifestElementInterface
@@ -223,5 +225,51 @@ class FromRepoRootTester(ManifestParserTester):
     def setUp(self):
         self._manifest = ScManifest.from_repo_root(Path(__file__).resolve().parent/'resources'/'mock_.repo')
 
+class RemoveProjectTester(unittest.TestCase):
+    def setUp(self):
+        self._manifest = ScManifest(Path(__file__).resolve().parent/'resources'/'remove_project_manifest.xml')
+
+    def test_remove_projects(self):
+        projects = self._manifest.projects
+        self.assertEqual([project.path for project in projects], ['dire', 'dird'], 'Expected only projects e and d to remain after <remove-project> filtering')
+        with self.assertRaises(AttributeError):
+            self._manifest.get_project_by_path('dira')
+        with self.assertRaises(AttributeError):
+            self._manifest.get_project_by_name('test_repo/repo_flow_test_projectb.git')
+
+    def test_replace_project(self):
+        projects = [project for project in self._manifest.projects if project.name == 'test_repo/replaced.git']
+        self.assertEqual(len(projects), 1, 'Expected <remove-project> to only remove the project declared before it')
+        self.assertEqual(projects[0].remote, 'new')
+        self.assertEqual(self._manifest.get_project_by_name('test_repo/replaced.git').remote, 'new')
+
+class SymlinkIncludeTester(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        tmp_path = Path(self._tmp_dir.name)
+        (tmp_path/'manifests').mkdir()
+        (tmp_path/'local').mkdir()
+        shutil.copy(Path(__file__).resolve().parent/'resources'/'test_manifest.xml', tmp_path/'manifests'/'common.xml')
+        (tmp_path/'local'/'foo.xml').write_text('<manifest><include name="common.xml"/></manifest>')
+        (tmp_path/'manifests'/'default.xml').symlink_to(Path('..')/'local'/'foo.xml')
+        self._manifest_path = tmp_path/'manifests'/'default.xml'
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def test_includes_relative_to_symlink(self):
+        manifest = ScManifest(self._manifest_path)
+        self.assertEqual(len(manifest.projects), 4, 'Expected includes to be resolved relative to the symlinked manifest')
+
+    def test_include_through_symlinked_directory(self):
+        tmp_path = Path(self._tmp_dir.name)
+        (tmp_path/'real'/'deep').mkdir(parents=True)
+        (tmp_path/'manifests'/'sub').symlink_to(Path('..')/'real'/'deep')
+        (tmp_path/'real'/'common.xml').write_text('<manifest><project name="real"/></manifest>')
+        (tmp_path/'manifests'/'parent.xml').write_text('<manifest><include name="sub/../common.xml"/></manifest>')
+        manifest = ScManifest(tmp_path/'manifests'/'parent.xml')
+        self.assertEqual([project.name for project in manifest.projects], ['real'], 'Expected the include to be opened through the symlinked directory')
+        self.assertIn(tmp_path/'manifests'/'sub'/'..'/'common.xml', manifest.manifests)
+
 if __name__ == '__main__':
     unittest.main()
@@ -73,8 +73,63 @@ class TestManifestWriting(unittest.TestCase):
 
         manifest = ScManifest(self.test_manifest)
         for i in manifest.projects:
-            self.assertTrue(any(c.name == "donut" and c.value == "donut" for c in i.children))
+            self.assertTrue(any(c.name == "donut" and c.value == "donut" for c in i.iter_children()))
         
+    def test_lookup_after_update(self):
+        manifest = ScManifest(self.test_manifest)
+
+        project = manifest.get_project_by_path("dira")
+        project.name = "donut"
+        self.assertEqual(manifest.get_project_by_name("donut").path, "dira")
+        with self.assertRaises(AttributeError):
+            manifest.get_project_by_name("test_repo/repo_flow_test_projecta.git")
+
+        project.remove()
+        with self.assertRaises(AttributeError):
+            manifest.get_project_by_path("dira")
+        self.assertEqual(len(manifest.projects), 3)
+
+    def test_update_default(self):
+        manifest = ScManifest(self.test_manifest)
+
+        manifest.default.remote = "donut"
+        for i in manifest.projects:
+            self.assertEqual(i.remote, "donut")
+
+        del manifest.default.remote
+        for i in manifest.projects:
+            self.assertIsNone(i.remote)
+
+    def test_write_keeps_comments(self):
+        self.test_manifest.write_text(
+            "<!-- header -->\n" + self.test_manifest.read_text().split("?>", 1)[1])
+        manifest = ScManifest(self.test_manifest)
+        manifest.write()
+
+        written = self.test_manifest.read_text()
+        self.assertTrue(written.startswith("<?xml"))
+        self.assertIn("<!-- header -->", written)
+        self.assertEqual(len(ScManifest(self.test_manifest).projects), 4)
+
+    def test_write_keeps_trailing_comment(self):
+        self.test_manifest.write_text(self.test_manifest.read_text() + "\n<!-- tail -->\n")
+        manifest = ScManifest(self.test_manifest)
+        manifest.write()
+
+        written = self.test_manifest.read_text()
+        self.assertTrue(written.rstrip().endswith("<!-- tail -->"))
+        self.assertEqual(len(ScManifest(self.test_manifest).projects), 4)
+
+    def test_write_keeps_doctype(self):
+        self.test_manifest.write_text(
+            "<!DOCTYPE manifest>\n" + self.test_manifest.read_text().split("?>", 1)[1])
+        manifest = ScManifest(self.test_manifest)
+        manifest.write()
+
+        written = self.test_manifest.read_text()
+        self.assertIn("<!DOCTYPE manifest>", written)
+        self.assertEqual(len(ScManifest(self.test_manifest).projects), 4)
+
     def test_remove(self):
         manifest = ScManifest(self.test_manifest)
 